@@ -1,98 +1,331 @@
 # Defines classes for ants, their world, their food, etc.
 from __future__ import annotations
-from typing import List, Dict
-from signals import Signal
-from utils import Position
+from typing import List, Dict, Tuple
+import numpy as np
+from scipy import ndimage
+from signals import Signal, step_grid, make_gradient, wrap_table, add_at, SIGNAL_SCALE, MAX_SIGNAL_DIST
+from utils import Position, DIRECTION_VECTORS
 
-class Cell:
+# Displacement of every direction, indexed by direction
+DX = np.array([v.x for v in DIRECTION_VECTORS], dtype=np.int32)
+DY = np.array([v.y for v in DIRECTION_VECTORS], dtype=np.int32)
+
+class World:
     """
-    Holds ants, food and signals
-    This is meant to be handled from World
+    A class that holds the state of the world as a set of grids.
+    Every grid has shape (W, H) and is indexed by [x, y]:
+        food: How much food each cell holds.
+        ant_idx: Index of the ant of the world's colony standing on each cell, or -1 if the cell is empty.
+        signals: One intensity grid per signal id, allocated the first time that signal is added.
+            Intensities are uint16 fixed point numbers, see signals.SIGNAL_SCALE.
+        signal_decay: One decay * intensity grid per signal id. Each cell decays at signal_decay / signals,
+            the intensity weighted average decay of every signal added to it.
     """
-    def __init__(self, pos: Position):
-        # Position of this cell
-        self.pos = pos
+    def __init__(self, W: int, H: int, diffusion: float = 0.0, seed: int = None):
+        if not 0 <= diffusion <= 1:
+            raise ValueError(f"Diffusion must be between 0 and 1, got {diffusion}")
+        self.W = W
+        self.H = H
+        # Fraction of each cell's signal that spreads to its 4 neighbours every step
+        self.diffusion = diffusion
+        # Seeds the stochastic rounding of signal grids
+        self.rng = np.random.default_rng(seed)
+        # How much food each cell holds.
+        self.food = np.zeros((W, H), dtype=np.float32)
         # A cell can hold only a single ant at a time
-        self.ant : Ant = None
-        # A dict of all signals in the cell
-        self.signals: Dict[str, Signal] = {}
-        # How much food this cell holds.
-        self.food : float = 0.0
+        self.ant_idx = np.full((W, H), -1, dtype=np.int32)
+        # Signal intensity grids by signal id
+        self.signals: Dict[str, np.ndarray] = {}
+        # Sum of decay * intensity of every signal added, by signal id
+        self.signal_decay: Dict[str, np.ndarray] = {}
+        # Scratch grids step uses to move intensity between cells, see signals.step_grid
+        self._flow: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Wrap tables for both axes, see signals.wrap_table
+        self._wx = wrap_table(W)
+        self._wy = wrap_table(H)
+        # Gradient fields recomputed every step, by signal id and distance
+        self.gradients: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = {}
+        # Ants living in this world, set by the Colony itself
+        self.colony: Colony = None
     
-    def grab_food(self, amount: float) -> float:
+    def grab_food(self, pos: Position, amount: float) -> float:
         """
         Returns as much food as possible, up to the amount of food contained in the cell.
         Removes the amount returned from the cell's food storage.
 
         Args:
+            pos (Position): Position of the cell to grab food from
             amount (float): Maximum food returned
 
         Returns:
             float: How much food is returned
         """
-        if self.food >= amount:
-            self.food -= amount
-            return amount
-        else:
-            amount = self.food
-            self.food = 0.0
-            return amount
+        x, y = pos.x % self.W, pos.y % self.H
+        amount = np.minimum(self.food[x, y], amount)
+        self.food[x, y] -= amount
+        return float(amount)
     
-    def get_signal(self, key: str) -> float:
+    def get_signal(self, pos: Position, id: str) -> float:
         """
-        Returns the intensity of a specific signal in this cell.
+        Returns the intensity of a specific signal in a cell.
 
         Args:
-            key (str): Identifier for the signal to search for
+            pos (Position): Position of the cell
+            id (str): Identifier for the signal to search for
 
         Returns:
             float: Intensity of the given signal
         """
-        if key in self.signals:
-            return self.signals[key].intensity
-        else:
+        # A single lookup, missing signals read as 0
+        S = self.signals.get(id)
+        if S is None:
+            return 0.0
+        return float(S[pos.x % self.W, pos.y % self.H]) / SIGNAL_SCALE
+    
+    def get_decay(self, pos: Position, id: str) -> float:
+        """
+        Returns the decay of a specific signal in a cell.
+
+        Args:
+            pos (Position): Position of the cell
+            id (str): Identifier for the signal to search for
+
+        Returns:
+            float: Decay of the given signal, 0 if the cell holds none of it
+        """
+        S = self.signals.get(id)
+        if S is None:
             return 0.0
+        x, y = pos.x % self.W, pos.y % self.H
+        if S[x, y] == 0:
+            return 0.0
+        return float(self.signal_decay[id][x, y]) * SIGNAL_SCALE / float(S[x, y])
     
-    def add_signal(self, signal: Signal):
+    def add_signal(self, pos: Position, signal: Signal):
         """
-        Increases signal intensity in the cell.
+        Increases signal intensity in a cell.
+        The decay of the cell is only merged with the signal's decay when it's read.
 
         Args:
+            pos (Position): Position of the cell
             signal (Signal): Signal to increase
+
+        Raises:
+            ValueError: The signal intensity is negative
         """
-        if signal.id in self.signals:
-            self.signals[signal.id].increase(signal)
+        S, DS = self.signal_grids(signal.id)
+        add_at(S, DS, np.array([pos.x % self.W]), np.array([pos.y % self.H]), signal, self.rng)
     
+    def signal_grids(self, id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the intensity and decay * intensity grids for a signal id, allocating them if they don't exist yet.
+
+        Args:
+            id (str): Identifier for the signal
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Intensity and decay * intensity grids
+        """
+        S = self.signals.get(id)
+        if S is None:
+            shape = (self.W, self.H)
+            S = self.signals[id] = np.zeros(shape, dtype=np.uint16)
+            self.signal_decay[id] = np.zeros(shape, dtype=np.float32)
+            self._flow[id] = (np.zeros(shape, dtype=np.int32), np.zeros(shape, dtype=np.float32))
+        return S, self.signal_decay[id]
     
+    def step(self, dt: float):
+        """
+        Advances all signal grids in time.
+        Evaporation and diffusion are applied in place, and intensities are clamped at 0.
+
+        Args:
+            dt (float): Amount of time to apply signal decay
+        """
+        for id, S in self.signals.items():
+            flow, flow_decay = self._flow[id]
+            step_grid(S, self.signal_decay[id], flow, flow_decay, self.diffusion, dt, int(self.rng.integers(2**62)))
+        for id, dist in self.gradients:
+            self._update_gradient(id, dist)
     
-class World:
-    """
-    A class that holds and works with a grid of Cells.
-    Cells are responsible for holding everything in the world: Ants, Food, Signals, Etc.
-    """
-    def __init__(self, W: int, H: int):
-        self.grid = [[Cell(Position(x, y)) for y in range(H)] for x in range(W)]
-        self.ants = []
-        
-    def get_cell(self, pos: Position) -> Cell:
-        return self.grid[pos%Position(self.W, self.H)]
+    def track_gradient(self, id: str, dist: int):
+        """
+        Precomputes the gradient of a signal for the whole grid after every step,
+        so signal_gradient with this id and distance becomes a lookup.
+        Signals added in between steps are not seen by the gradient until the next step.
+
+        Args:
+            id (str): Identifier for the signal
+            dist (int): Half size of the window
+        """
+        self._check_dist(dist)
+        self._update_gradient(id, dist)
+    
+    def _check_dist(self, dist: int):
+        # Windows index the wrap tables, which only reach MAX_SIGNAL_DIST cells past the grid
+        if dist > MAX_SIGNAL_DIST:
+            raise ValueError(f"Cannot sample signals {dist} cells away, the maximum is {MAX_SIGNAL_DIST}")
     
-    def get_signal(self, pos : Position, id: str) -> float:
-        return self.get_cell(pos).get_signal(id)
+    def _update_gradient(self, id: str, dist: int):
+        S = self.signals.get(id)
+        if S is None:
+            self.gradients[id, dist] = (np.zeros((self.W, self.H), dtype=np.float32),) * 2
+            return
+        # The window moment is separable: weight by offset along one axis and sum along the other.
+        # The offset weights also convert the fixed point grid back to intensities.
+        offsets = np.arange(-dist, dist + 1, dtype=np.float32) / SIGNAL_SCALE
+        ones = np.ones(2 * dist + 1, dtype=np.float32)
+        gx = ndimage.correlate1d(S, offsets, axis=0, mode='wrap', output=np.float32)
+        ndimage.correlate1d(gx, ones, axis=1, mode='wrap', output=gx)
+        gy = ndimage.correlate1d(S, offsets, axis=1, mode='wrap', output=np.float32)
+        ndimage.correlate1d(gy, ones, axis=0, mode='wrap', output=gy)
+        self.gradients[id, dist] = (gx, gy)
     
     def signal_gradient(self, pos: Position, dist: int, id: str) -> Position:
-        grad = Position(0, 0)
-        for x in range(-dist, dist + 1, 1):
-            for y in range(-dist, dist + 1, 1):
-                offset = Position(x, y)
-                signal = self.get_signal(pos + offset, id)
-                grad += offset * signal
-        return grad
-        
-        
-    
-    
-class Ant:
+        """
+        Returns the first moment of a signal over the square window around a cell,
+        which points towards where the signal is stronger.
+
+        Args:
+            pos (Position): Center of the window
+            dist (int): Half size of the window
+            id (str): Identifier for the signal
+
+        Returns:
+            Position: Signal gradient
+        """
+        gx, gy = self.signal_gradients(np.array([pos.x % self.W]), np.array([pos.y % self.H]), dist, id)
+        return Position(int(gx[0]), int(gy[0]))
+    
+    def signal_gradients(self, xs: np.ndarray, ys: np.ndarray, dist: int, id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched version of signal_gradient for many positions at once.
+        Positions must already be inside the grid, like the positions of a Colony.
+
+        Args:
+            xs (np.ndarray): X coordinates of the window centers, from 0 to W - 1
+            ys (np.ndarray): Y coordinates of the window centers, from 0 to H - 1
+            dist (int): Half size of the window
+            id (str): Identifier for the signal
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: X and Y components of the gradient for every position
+        """
+        self._check_dist(dist)
+        if (id, dist) in self.gradients:
+            gx, gy = self.gradients[id, dist]
+            return gx[xs, ys], gy[xs, ys]
+        S = self.signals.get(id)
+        if S is None:
+            return np.zeros(len(xs), dtype=np.float32), np.zeros(len(ys), dtype=np.float32)
+        gx = np.empty(len(xs), dtype=np.float32)
+        gy = np.empty(len(ys), dtype=np.float32)
+        # A single dtype for the coordinates, so each kernel only compiles once
+        xs = np.asarray(xs, dtype=np.int32)
+        ys = np.asarray(ys, dtype=np.int32)
+        make_gradient(dist)(S, self._wx, self._wy, xs, ys, dist, gx, gy)
+        return gx / SIGNAL_SCALE, gy / SIGNAL_SCALE
+    
+    
+class Colony:
+    """
+    Holds all the ants of a world as a set of arrays, an ant is just an index into them:
+        pos_x, pos_y: Position of each ant.
+        dir: Direction each ant is facing.
+        state: What each ant is doing, free for behaviours to use.
+    Every method works on all the ants at once.
     """
-    AN ANT!
-    """
\ No newline at end of file
+    def __init__(self, world: World, count: int, seed: int = None):
+        """
+        Spawns ants on random empty cells of the world.
+
+        Args:
+            world (World): World the ants live in
+            count (int): Number of ants
+            seed (int, optional): Seed for the colony's random generator. Defaults to None.
+
+        Raises:
+            ValueError: The world already has a colony
+        """
+        # ant_idx holds indices into a single colony
+        if world.colony is not None:
+            raise ValueError("Cannot add a second colony to a world")
+        self.world = world
+        self.rng = np.random.default_rng(seed)
+        empty = np.flatnonzero(world.ant_idx.ravel() == -1)
+        cells = self.rng.choice(empty, count, replace=False)
+        self.pos_x = (cells // world.H).astype(np.int32)
+        self.pos_y = (cells % world.H).astype(np.int32)
+        self.dir = self.rng.integers(0, len(DX), count, dtype=np.int8)
+        self.state = np.zeros(count, dtype=np.int8)
+        world.ant_idx[self.pos_x, self.pos_y] = np.arange(count, dtype=np.int32)
+        world.colony = self
+    
+    def __len__(self) -> int:
+        return len(self.pos_x)
+    
+    def move(self) -> np.ndarray:
+        """
+        Moves every ant a cell forward in the direction it's facing.
+        Ants can't move into a cell that was occupied before the move,
+        and when several ants try to move into the same cell only the one with the lowest index does.
+
+        Returns:
+            np.ndarray: Mask of the ants that moved
+        """
+        world = self.world
+        tx = world._wx[self.pos_x + (DX[self.dir] + MAX_SIGNAL_DIST)]
+        ty = world._wy[self.pos_y + (DY[self.dir] + MAX_SIGNAL_DIST)]
+        free = np.flatnonzero(world.ant_idx[tx, ty] == -1)
+        # np.unique returns the first occurrence of every cell, which is the lowest ant index
+        _, first = np.unique(tx[free] * world.H + ty[free], return_index=True)
+        moving = np.zeros(len(self), dtype=bool)
+        moving[free[first]] = True
+        world.ant_idx[self.pos_x[moving], self.pos_y[moving]] = -1
+        self.pos_x[moving] = tx[moving]
+        self.pos_y[moving] = ty[moving]
+        world.ant_idx[self.pos_x[moving], self.pos_y[moving]] = np.flatnonzero(moving)
+        return moving
+    
+    def sense(self, id: str) -> np.ndarray:
+        """
+        Returns the intensity of a signal under every ant.
+
+        Args:
+            id (str): Identifier for the signal
+
+        Returns:
+            np.ndarray: Signal intensity for every ant
+        """
+        S = self.world.signals.get(id)
+        if S is None:
+            return np.zeros(len(self), dtype=np.float32)
+        return S[self.pos_x, self.pos_y] / np.float32(SIGNAL_SCALE)
+    
+    def sense_gradient(self, dist: int, id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the signal gradient around every ant, see World.signal_gradient.
+
+        Args:
+            dist (int): Half size of the window
+            id (str): Identifier for the signal
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: X and Y components of the gradient for every ant
+        """
+        return self.world.signal_gradients(self.pos_x, self.pos_y, dist, id)
+    
+    def deposit(self, signal: Signal, mask: np.ndarray = None):
+        """
+        Adds a signal on the cell under every ant.
+
+        Args:
+            signal (Signal): Signal to add
+            mask (np.ndarray, optional): Which ants deposit the signal. Defaults to all of them.
+
+        Raises:
+            ValueError: The signal intensity is negative
+        """
+        xs, ys = (self.pos_x, self.pos_y) if mask is None else (self.pos_x[mask], self.pos_y[mask])
+        S, DS = self.world.signal_grids(signal.id)
+        add_at(S, DS, xs, ys, signal, self.world.rng)
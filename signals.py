@@ -1,7 +1,17 @@
 # Defines classes for signaling using "pheromones"
 from __future__ import annotations
+import numpy as np
+from typing import Callable, Dict
+from numba import njit, prange
+
+# Signal grids store intensities as uint16 fixed point numbers: intensity * SIGNAL_SCALE.
+# That gives a resolution of 0.001 and a maximum intensity of SIGNAL_MAX / SIGNAL_SCALE (65.535).
+SIGNAL_SCALE = 1000
+SIGNAL_MAX = np.iinfo(np.uint16).max
 
 class Signal:
+    __slots__ = ('id', 'intensity', 'decay')
+    
     def __init__(self, id: str, intensity: float, decay: float = 1.0):
         self.id = id
         self.intensity = intensity
@@ -34,4 +44,234 @@ class Signal:
         if self.id != signal.id:
             raise Exception(f"Tried to add two signals that don't share ids: {self.id} + {signal.id}")
         self.decay = (signal.decay * signal.intensity + self.decay * self.intensity) / (signal.intensity + self.intensity)
-        self.intensity += signal.intensity
\ No newline at end of file
+        self.intensity += signal.intensity
+
+
+def add_at(S: np.ndarray, DS: np.ndarray, xs: np.ndarray, ys: np.ndarray, signal: Signal, rng: np.random.Generator):
+    """
+    Adds a signal to many cells of a signal grid.
+    Cells repeated in xs, ys get the signal once per repetition, and cells saturate at SIGNAL_MAX instead of overflowing.
+    Decay * intensity only grows by the intensity that actually fit in each cell.
+    Intensities are rounded to fixed point units stochastically, so deposits smaller than a unit still add up on average.
+
+    Args:
+        S (np.ndarray): Signal grid, in fixed point
+        DS (np.ndarray): Decay * intensity grid
+        xs (np.ndarray): X coordinate of every cell
+        ys (np.ndarray): Y coordinate of every cell
+        signal (Signal): Signal added to every cell
+        rng (np.random.Generator): Random generator used for the rounding
+
+    Raises:
+        ValueError: The signal intensity is negative
+    """
+    if not signal.intensity >= 0:
+        raise ValueError(f"Signal intensity must be non negative, got {signal.intensity}")
+    cells, counts = np.unique(xs.astype(np.int64) * S.shape[1] + ys, return_counts=True)
+    # Anything above SIGNAL_MAX saturates the cell anyway
+    units = min(signal.intensity * SIGNAL_SCALE, SIGNAL_MAX)
+    whole = int(units)
+    flat = S.reshape(-1)
+    before = flat[cells].astype(np.int64)
+    after = np.minimum(before + counts * whole + rng.binomial(counts, units - whole), SIGNAL_MAX)
+    flat[cells] = after
+    DS.reshape(-1)[cells] += signal.decay * (after - before) / SIGNAL_SCALE
+
+@njit(inline='always')
+def _cell_hash(x: int, y: int, seed: int) -> int:
+    # splitmix64 of a cell and a step seed, so the random numbers of a step only depend on the seed
+    z = np.uint64(seed) + np.uint64(x) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(y) * np.uint64(0xC2B2AE3D27D4EB4F)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+@njit(inline='always')
+def _share(total: int, first: int, k: int) -> int:
+    # Units of an outflow that go to neighbour k (0 left, 1 right, 2 up, 3 down)
+    return (total >> 2) + (1 if (k - first) & 3 < total & 3 else 0)
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _evaporate_and_send(S: np.ndarray, DS: np.ndarray, flow: np.ndarray, flow_decay: np.ndarray, rate: float, dt: float, seed: int):
+    # First pass: every cell evaporates and sets aside the units it sends to its neighbours.
+    # S and DS keep what stays in the cell, flow gets sent units * 4 + the neighbour that gets the first of the
+    # units left after splitting them in 4, and flow_decay the decay * intensity of a single sent unit.
+    W, H = S.shape
+    for x in prange(W):
+        for y in range(H):
+            s = np.int64(S[x, y])
+            if s == 0:
+                flow[x, y] = 0
+                continue
+            h = _cell_hash(x, y, seed)
+            # One hash per cell: the top 32 bits round the outflow, the next 30 bits the evaporation,
+            # the lowest 2 bits pick the first neighbour.
+            decay = DS[x, y] * SIGNAL_SCALE / s
+            s = np.int64(s - decay * dt * SIGNAL_SCALE + np.float64((h >> np.uint64(2)) & np.uint64(0x3FFFFFFF)) * (1.0 / 1073741824.0))
+            if s <= 0:
+                S[x, y] = 0
+                DS[x, y] = 0.0
+                flow[x, y] = 0
+                continue
+            sent = min(np.int64(rate * s + np.float64(h >> np.uint64(32)) * (1.0 / 4294967296.0)), s)
+            S[x, y] = s - sent
+            DS[x, y] = decay * (s - sent) / SIGNAL_SCALE
+            flow[x, y] = sent * 4 + np.int64(h & np.uint64(3))
+            flow_decay[x, y] = decay / SIGNAL_SCALE
+
+@njit(inline='always')
+def _inflow(flow: np.ndarray, flow_decay: np.ndarray, x: int, y: int, k: int):
+    # Units and decay * intensity that cell x, y sends to its neighbour k
+    f = flow[x, y]
+    got = _share(f >> 2, f & 3, k)
+    if got == 0:
+        return 0, 0.0
+    return got, flow_decay[x, y] * got
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _gather(S: np.ndarray, DS: np.ndarray, flow: np.ndarray, flow_decay: np.ndarray):
+    # Second pass: every cell collects the shares its 4 neighbours sent towards it
+    W, H = S.shape
+    for x in prange(W):
+        xl = x - 1 if x > 0 else W - 1
+        xr = x + 1 if x < W - 1 else 0
+        for y in range(H):
+            yu = y - 1 if y > 0 else H - 1
+            yd = y + 1 if y < H - 1 else 0
+            s = np.int64(S[x, y])
+            ds = np.float64(DS[x, y])
+            got, got_ds = _inflow(flow, flow_decay, xl, y, 1)
+            s += got
+            ds += got_ds
+            got, got_ds = _inflow(flow, flow_decay, xr, y, 0)
+            s += got
+            ds += got_ds
+            got, got_ds = _inflow(flow, flow_decay, x, yu, 3)
+            s += got
+            ds += got_ds
+            got, got_ds = _inflow(flow, flow_decay, x, yd, 2)
+            s += got
+            ds += got_ds
+            if s > SIGNAL_MAX:
+                ds *= SIGNAL_MAX / s
+                s = SIGNAL_MAX
+            S[x, y] = s
+            DS[x, y] = ds
+
+def step_grid(S: np.ndarray, DS: np.ndarray, flow: np.ndarray, flow_decay: np.ndarray, rate: float, dt: float, seed: int):
+    """
+    Applies evaporation and diffusion to a wrapping signal grid, in place.
+    Each cell decays at DS / S, the intensity weighted average decay of the signals added to it.
+    That is the same decay Signal.increase computes, but merged once per cell and step instead of on every deposit.
+
+    Runs in two passes: the first evaporates every cell and stores the units it sends into flow and flow_decay,
+    the second gathers them into the neighbours. That way each cell's outflow is computed once, with a single
+    hash and divide, instead of once for itself and once for each of its neighbours.
+
+    Intensities stay in whole fixed point units. Diffusion moves whole units between cells, so it never creates or
+    loses intensity. Both diffusion and evaporation round stochastically, so changes smaller than a unit still happen
+    on average instead of being rounded away. The random numbers are hashed from the cell and the seed, so a step is
+    reproducible for a given seed.
+
+    Args:
+        S (np.ndarray): Signal intensities, in fixed point
+        DS (np.ndarray): Decay * intensity
+        flow (np.ndarray): int32 scratch grid with the shape of S
+        flow_decay (np.ndarray): float32 scratch grid with the shape of S
+        rate (float): Fraction of each cell's intensity that spreads to its 4 neighbours, from 0 to 1
+        dt (float): Amount of time to apply signal decay
+        seed (int): Non negative seed for the rounding of this step
+    """
+    _evaporate_and_send(S, DS, flow, flow_decay, rate, dt, seed)
+    _gather(S, DS, flow, flow_decay)
+
+# Largest distance an ant can look or move away from its cell in a single query
+MAX_SIGNAL_DIST = 16
+
+# Windows up to this distance get a kernel with the window unrolled, larger ones use gradient_loop.
+# Unrolled kernels compile in well under a second up to here, and their compile time grows with the window area.
+UNROLL_MAX_DIST = 2
+
+def wrap_table(size: int) -> np.ndarray:
+    """
+    Returns the wrapped index of every coordinate from -MAX_SIGNAL_DIST to size + MAX_SIGNAL_DIST,
+    read at coordinate + MAX_SIGNAL_DIST. Turns the wrap around of a grid into a table load.
+    """
+    return np.arange(-MAX_SIGNAL_DIST, size + MAX_SIGNAL_DIST, dtype=np.int32) % size
+
+@njit(parallel=True, fastmath=True, cache=True)
+def gradient_loop(S: np.ndarray, wx: np.ndarray, wy: np.ndarray, xs: np.ndarray, ys: np.ndarray, dist: int, gx: np.ndarray, gy: np.ndarray):
+    """
+    Computes the signal gradient around many cells of a signal grid, for any window size.
+
+    Args:
+        S (np.ndarray): Signal grid, in fixed point
+        wx (np.ndarray): Wrap table for the x axis, see wrap_table
+        wy (np.ndarray): Wrap table for the y axis, see wrap_table
+        xs (np.ndarray): X coordinates of the window centers, inside the grid
+        ys (np.ndarray): Y coordinates of the window centers, inside the grid
+        dist (int): Half size of the window, at most MAX_SIGNAL_DIST
+        gx (np.ndarray): Output for the x components, in the fixed point units of S
+        gy (np.ndarray): Output for the y components, in the fixed point units of S
+    """
+    for i in prange(xs.shape[0]):
+        x = xs[i] + MAX_SIGNAL_DIST
+        y = ys[i] + MAX_SIGNAL_DIST
+        sx = 0.0
+        sy = 0.0
+        for dx in range(-dist, dist + 1):
+            row = wx[x + dx]
+            for dy in range(-dist, dist + 1):
+                s = np.float64(S[row, wy[y + dy]])
+                sx += dx * s
+                sy += dy * s
+        gx[i] = sx
+        gy[i] = sy
+
+# Compiled unrolled gradient kernels by distance
+_gradient_kernels: Dict[int, Callable] = {}
+
+def make_gradient(dist: int) -> Callable:
+    """
+    Returns a compiled function that computes the signal gradient around many cells of a signal grid.
+    Up to UNROLL_MAX_DIST, the function is generated for the given distance: the (2*dist+1)x(2*dist+1) window
+    is unrolled into straight line code with every offset as a constant.
+    Generated kernels are cached, so only the first call with some distance pays for generation and compilation.
+    Larger distances get gradient_loop.
+
+    The returned function takes (S, wx, wy, xs, ys, dist, gx, gy) like gradient_loop.
+    xs and ys must be int32 arrays, so every kernel is compiled for a single signature.
+
+    Args:
+        dist (int): Half size of the window
+
+    Returns:
+        Callable: Gradient kernel
+    """
+    if dist > UNROLL_MAX_DIST:
+        return gradient_loop
+    if dist not in _gradient_kernels:
+        lines = [
+            "def gradient(S, wx, wy, xs, ys, dist, gx, gy):",
+            "    for i in range(xs.shape[0]):",
+            f"        x = xs[i] + {MAX_SIGNAL_DIST}",
+            f"        y = ys[i] + {MAX_SIGNAL_DIST}",
+            "        sx = 0.0",
+            "        sy = 0.0",
+        ]
+        for dx in range(-dist, dist + 1):
+            lines.append(f"        row = wx[x + {dx}]")
+            for dy in range(-dist, dist + 1):
+                # The center cell has no weight
+                if dx == 0 and dy == 0:
+                    continue
+                lines.append(f"        s = np.float64(S[row, wy[y + {dy}]])")
+                if dx:
+                    lines.append(f"        sx += {dx} * s")
+                if dy:
+                    lines.append(f"        sy += {dy} * s")
+        lines.append("        gx[i] = sx")
+        lines.append("        gy[i] = sy")
+        namespace = {'np': np}
+        exec("\n".join(lines), namespace)
+        _gradient_kernels[dist] = njit(fastmath=True)(namespace['gradient'])
+    return _gradient_kernels[dist]
@@ -0,0 +1,84 @@
+import numpy as np
+from ants import World, Colony
+from signals import Signal, add_at
+from utils import Direction
+
+def place(world: World, xs, ys, dirs) -> Colony:
+    """
+    Builds a colony with ants at known positions and directions.
+    """
+    colony = Colony(world, len(xs), seed=0)
+    world.ant_idx.fill(-1)
+    colony.pos_x[:] = xs
+    colony.pos_y[:] = ys
+    colony.dir[:] = dirs
+    world.ant_idx[colony.pos_x, colony.pos_y] = np.arange(len(xs))
+    return colony
+
+def assert_ant_idx_consistent(world: World, colony: Colony):
+    assert (world.ant_idx >= 0).sum() == len(colony)
+    assert (world.ant_idx[colony.pos_x, colony.pos_y] == np.arange(len(colony))).all()
+
+def test_same_target_lowest_index_wins():
+    world = World(8, 8)
+    colony = place(world, [1, 3], [2, 2], [Direction.RIGHT, Direction.LEFT])
+    moving = colony.move()
+    assert moving.tolist() == [True, False]
+    assert (colony.pos_x.tolist(), colony.pos_y.tolist()) == ([2, 3], [2, 2])
+    assert_ant_idx_consistent(world, colony)
+
+def test_cannot_enter_cell_being_vacated():
+    world = World(8, 8)
+    colony = place(world, [1, 2], [1, 1], [Direction.RIGHT, Direction.RIGHT])
+    moving = colony.move()
+    assert moving.tolist() == [False, True]
+    assert (colony.pos_x.tolist(), colony.pos_y.tolist()) == ([1, 3], [1, 1])
+    assert_ant_idx_consistent(world, colony)
+    # The cell is free on the next move
+    assert colony.move().tolist() == [True, True]
+    assert colony.pos_x.tolist() == [2, 4]
+
+def test_move_wraps_around():
+    world = World(4, 5)
+    colony = place(world, [0, 3], [0, 4], [Direction.UP, Direction.DOWN])
+    colony.move()
+    assert (colony.pos_x.tolist(), colony.pos_y.tolist()) == ([0, 3], [4, 0])
+    assert_ant_idx_consistent(world, colony)
+
+def test_random_walk_keeps_single_ant_per_cell():
+    world = World(12, 10)
+    colony = Colony(world, 60, seed=3)
+    for _ in range(50):
+        colony.dir[:] = colony.rng.integers(0, 4, len(colony))
+        colony.move()
+        assert_ant_idx_consistent(world, colony)
+
+def test_repeated_deposits_accumulate():
+    world = World(8, 8)
+    colony = place(world, [1, 5], [1, 6], [Direction.UP, Direction.UP])
+    signal = Signal('a', 0.5, 1.0)
+    colony.deposit(signal)
+    colony.deposit(signal, mask=np.array([True, False]))
+    assert np.allclose(colony.sense('a'), [1.0, 0.5])
+    assert world.signals['a'].sum() == world.signals['a'][1, 1] + world.signals['a'][5, 6]
+
+def test_add_at_repeated_cells():
+    S = np.zeros((4, 4), dtype=np.uint16)
+    DS = np.zeros((4, 4), dtype=np.float32)
+    add_at(S, DS, np.array([1, 1, 2, 1]), np.array([0, 0, 3, 0]), Signal('a', 0.25, 2.0), np.random.default_rng(0))
+    assert S[1, 0] == 750
+    assert S[2, 3] == 250
+    assert S.sum() == 1000
+    assert np.allclose(DS[1, 0], 1.5)
+    assert np.allclose(DS[2, 3], 0.5)
+
+def test_single_colony_per_world():
+    world = World(8, 8)
+    Colony(world, 3, seed=0)
+    try:
+        Colony(world, 3, seed=1)
+    except ValueError:
+        pass
+    else:
+        assert False, "Expected a ValueError"
+    assert (world.ant_idx >= 0).sum() == 3
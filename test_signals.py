@@ -0,0 +1,132 @@
+import numpy as np
+from ants import World, Colony
+from signals import Signal, make_gradient, SIGNAL_SCALE, SIGNAL_MAX, MAX_SIGNAL_DIST
+from utils import Position
+
+def test_evaporation_at_60_fps():
+    # decay * dt is a fraction of a fixed point unit per step, it still has to add up
+    world = World(8, 8, seed=0)
+    world.add_signal(Position(3, 3), Signal('a', 1.0, 0.01))
+    for _ in range(1000):
+        world.step(0.016)
+    assert abs(world.get_signal(Position(3, 3), 'a') - 0.84) < 0.02
+
+def test_evaporation_reaches_zero():
+    world = World(8, 8, seed=0)
+    world.add_signal(Position(3, 3), Signal('a', 0.5, 1.0))
+    for _ in range(40):
+        world.step(0.016)
+    assert world.signals['a'].sum() == 0
+    assert world.signal_decay['a'].sum() == 0
+
+def test_diffusion_conserves_mass_without_decay():
+    world = World(8, 8, diffusion=0.05, seed=0)
+    world.add_signal(Position(3, 3), Signal('a', 1.0, 0.0))
+    for _ in range(200):
+        world.step(0.016)
+    S = world.signals['a']
+    assert int(S.sum()) == SIGNAL_SCALE
+    # The signal did spread, and more is left near where it was added
+    assert (S > 0).sum() > 20
+    assert S[3, 3] > S[7, 7]
+
+def test_diffusion_keeps_decay_with_signal():
+    world = World(8, 8, diffusion=0.2, seed=0)
+    world.add_signal(Position(3, 3), Signal('a', 2.0, 0.5))
+    for _ in range(10):
+        world.step(0.001)
+    S = world.signals['a']
+    cells = S > 0
+    assert cells.sum() > 1
+    assert np.allclose(world.signal_decay['a'][cells] * SIGNAL_SCALE / S[cells], 0.5, rtol=1e-3)
+
+def test_step_is_reproducible():
+    grids = []
+    for _ in range(2):
+        world = World(8, 8, diffusion=0.3, seed=7)
+        world.add_signal(Position(1, 1), Signal('a', 3.0, 0.2))
+        for _ in range(20):
+            world.step(0.016)
+        grids.append(world.signals['a'].copy())
+    assert (grids[0] == grids[1]).all()
+
+def test_saturated_deposit_keeps_decay():
+    world = World(8, 8)
+    pos = Position(2, 2)
+    world.add_signal(pos, Signal('a', 100.0, 1.0))
+    assert world.get_signal(pos, 'a') == SIGNAL_MAX / SIGNAL_SCALE
+    assert abs(world.get_decay(pos, 'a') - 1.0) < 1e-6
+    world.add_signal(pos, Signal('a', 5.0, 3.0))
+    assert abs(world.get_decay(pos, 'a') - 1.0) < 1e-6
+
+def test_saturated_colony_deposit_keeps_decay():
+    world = World(8, 8)
+    colony = Colony(world, 4, seed=0)
+    for _ in range(3):
+        colony.deposit(Signal('a', 30.0, 2.0))
+    S = world.signals['a'][colony.pos_x, colony.pos_y]
+    DS = world.signal_decay['a'][colony.pos_x, colony.pos_y]
+    assert (S == SIGNAL_MAX).all()
+    assert np.allclose(DS * SIGNAL_SCALE / S, 2.0)
+
+def test_negative_deposit_raises():
+    world = World(8, 8)
+    colony = Colony(world, 4, seed=0)
+    for check in (lambda: world.add_signal(Position(2, 2), Signal('a', -0.5)),
+                  lambda: colony.deposit(Signal('a', -0.5))):
+        try:
+            check()
+        except ValueError:
+            continue
+        assert False, "Expected a ValueError"
+    assert world.signals['a'].sum() == 0
+
+def test_small_deposits_add_up():
+    # 0.0004 is less than a fixed point unit, it still has to add up
+    world = World(8, 8, seed=0)
+    for _ in range(1000):
+        world.add_signal(Position(2, 2), Signal('a', 0.0004, 1.0))
+    assert abs(world.get_signal(Position(2, 2), 'a') - 0.4) < 0.05
+    assert abs(world.get_decay(Position(2, 2), 'a') - 1.0) < 1e-4
+    colony = Colony(world, 10, seed=0)
+    for _ in range(1000):
+        colony.deposit(Signal('b', 0.0004, 1.0))
+    assert abs(colony.sense('b').mean() - 0.4) < 0.05
+
+def test_gradient_kernels_match_tracked_gradient():
+    world = World(23, 17, diffusion=0.2, seed=0)
+    colony = Colony(world, 80, seed=1)
+    for _ in range(10):
+        colony.move()
+        colony.deposit(Signal('a', 1.0, 0.1))
+        world.step(0.016)
+    # One unrolled and one looped window
+    for dist in (2, 6):
+        window = colony.sense_gradient(dist, 'a')
+        world.track_gradient('a', dist)
+        tracked = colony.sense_gradient(dist, 'a')
+        assert np.allclose(window, tracked, atol=1e-3)
+
+def test_gradient_kernels_compile_once():
+    world = World(11, 13, seed=0)
+    colony = Colony(world, 5, seed=1)
+    colony.deposit(Signal('a', 1.0, 0.1))
+    kernel = make_gradient(1)
+    world.signal_gradient(Position(2, 3), 1, 'a')
+    colony.sense_gradient(1, 'a')
+    # A world of another size has to reuse the same compiled kernel
+    other = World(7, 9)
+    other.add_signal(Position(0, 0), Signal('a', 1.0))
+    other.signal_gradient(Position(0, 0), 1, 'a')
+    assert make_gradient(1) is kernel
+    assert len(kernel.signatures) == 1
+
+def test_gradient_dist_limit():
+    world = World(8, 8)
+    for check in (lambda: world.signal_gradient(Position(0, 0), MAX_SIGNAL_DIST + 1, 'missing'),
+                  lambda: world.track_gradient('a', MAX_SIGNAL_DIST + 1)):
+        try:
+            check()
+        except ValueError:
+            continue
+        assert False, "Expected a ValueError"
@@ -0,0 +1,69 @@
+import numpy as np
+from utils import Position, Vector, Direction, DirectionError
+
+def test_move_dir():
+    pos = Position(1, 2)
+    assert pos.move_dir(Direction.UP) == Position(1, 1)
+    assert pos.move_dir(Direction.LEFT, 2) == Position(-1, 2)
+    assert pos.move_dir(Direction.DOWN) == Position(1, 3)
+    assert pos.move_dir(3) == Position(2, 2)
+
+def test_move_dir_invalid_direction():
+    for obj in (Position(1, 2), Vector(1.0, 2.0)):
+        for direction in (4, -1, 'UP', 1.5, None):
+            try:
+                obj.move_dir(direction)
+            except DirectionError:
+                continue
+            assert False, f"Expected a DirectionError for {direction!r}"
+
+def test_vector_add_sub_return_vectors():
+    a = Vector(1.0, 2.0)
+    assert a + Vector(0.5, 0.25) == Vector(1.5, 2.25)
+    assert a - Vector(0.5, 0.25) == Vector(0.5, 1.75)
+    assert isinstance(a + Position(1, 1), Vector)
+    assert a + Position(1, 1) == Vector(2.0, 3.0)
+    assert a - Position(1, 1) == Vector(0.0, 1.0)
+
+def test_vector_scaling():
+    a = Vector(1.0, 2.0)
+    assert a * 2 == Vector(2.0, 4.0)
+    assert 2.0 * a == Vector(2.0, 4.0)
+    assert a * np.float32(2) == Vector(2.0, 4.0)
+    assert a * np.int64(3) == Vector(3.0, 6.0)
+    assert a / 2 == Vector(0.5, 1.0)
+    assert a / np.float32(4) == Vector(0.25, 0.5)
+
+def test_vector_invalid_operands_raise():
+    a = Vector(1.0, 2.0)
+    for op in (lambda: a / 'x', lambda: a * 'x', lambda: a + 1, lambda: a - 1):
+        try:
+            op()
+        except TypeError:
+            continue
+        assert False, "Expected a TypeError"
+
+def test_vector_divide_by_zero():
+    for zero in (0, 0.0, np.float32(0)):
+        try:
+            Vector(1.0, 2.0) / zero
+        except ZeroDivisionError:
+            continue
+        assert False, "Expected a ZeroDivisionError"
+
+def test_vector_repr():
+    assert repr(Vector(1.0, 2.5)) == "Vector(1.0, 2.5)"
+    assert str(Vector(1.0, 2.5)) == "(1.0, 2.5)"
+
+def test_vector_moves_return_vectors():
+    a = Vector(0.5, 0.5)
+    assert a.move_dir(Direction.UP) == Vector(0.5, -0.5)
+    assert a.move_dir(Direction.RIGHT, 2) == Vector(2.5, 0.5)
+    assert a.move(1, -1) == Vector(1.5, -0.5)
+    assert isinstance(a.move_dir(Direction.DOWN), Vector)
+    assert isinstance(a.move(0, 0), Vector)
+
+def test_vector_magnitude():
+    a = Vector(3.0, 4.0)
+    assert a.sqr_magnitude() == 25.0
+    assert a.magnitude() == 5.0
@@ -1,8 +1,7 @@
 from __future__ import annotations
 from enum import IntEnum
 from dataclasses import dataclass
-from functools import cached_property
-import warnings
+import numpy as np
 
 # Defines positional classes
 
@@ -19,7 +18,7 @@ class Direction(IntEnum):
 class DirectionError(Exception):
     pass
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Position:
     x : int
     y : int
@@ -32,7 +31,6 @@ class Position:
     def __eq__(self, other) -> bool:
         if isinstance(other, Position):
             return self.x == other.x and self.y == other.y
-        warnings.warn(f"Warning: Tried to compare Position to {type(other)}")
         return NotImplemented
     
     def __add__(self, other: Position) -> Position:
@@ -48,8 +46,6 @@ class Position:
     def __mul__(self, other: int) -> Position:
         if isinstance(other, int):
             return Position(self.x * other, self.y * other)
-        elif isinstance(other, float):
-            return Position(round(self.x * other), round(self.y * other))
         raise TypeError(f"Cannot multiply Position with {type(other)}")
 
     def __truediv__(self, other: int) -> Position:
@@ -88,10 +84,10 @@ class Position:
         """
         
         # In grids, the y axis is inverted. (0 is upmost, and we go down from there)
-        try:
-            return self + DIRECTION_VECTORS[direction] * distance
-        except KeyError:
+        if not isinstance(direction, int) or not 0 <= direction < 4:
             raise DirectionError(f"Cannot move position in direction \"{direction}\" because it's not a valid direction.")
+        v = DIRECTION_VECTORS[direction]
+        return Position(self.x + v.x * distance, self.y + v.y * distance)
 
     def move(self, x: int = 0, y: int = 0) -> Position:
         """Moves a vector by x and y coors.
@@ -116,19 +112,41 @@ class Position:
             return max(abs(self.x - other.x), abs(self.y - other.y))
         raise TypeError(f"Cannot calculate distance between Position and {type(other)}")
 
-DIRECTION_VECTORS = {
-    Direction.UP:    Position(0, -1),
-    Direction.LEFT:  Position(-1, 0),
-    Direction.DOWN:  Position(0, 1),
-    Direction.RIGHT: Position(1, 0),
-}
+# Indexed by direction, the order must match the Direction codes
+DIRECTION_VECTORS = (
+    Position(0, -1), # UP
+    Position(-1, 0), # LEFT
+    Position(0, 1),  # DOWN
+    Position(1, 0),  # RIGHT
+)
+
+# Numbers a Vector can be scaled by, including NumPy scalars like the ones its own array holds
+SCALAR_TYPES = (int, float, np.integer, np.floating)
 
-@dataclass(frozen=True)
 class Vector:
-    x : float
-    y : float
+    """
+    A 2d vector that works with float numbers, backed by a 2 element float32 array.
+    Arithmetic goes through NumPy, and bulk code can work on the raw arrays in v directly.
+    """
+    __slots__ = ('v',)
     
-    # A 2d vector that works with int numbers and usually represents a position on a grid
+    def __init__(self, x: float, y: float):
+        self.v = np.array((x, y), dtype=np.float32)
+    
+    @staticmethod
+    def from_array(v: np.ndarray) -> Vector:
+        # Wraps an existing array without copying it
+        r = Vector.__new__(Vector)
+        r.v = v
+        return r
+    
+    @property
+    def x(self) -> float:
+        return float(self.v[0])
+    
+    @property
+    def y(self) -> float:
+        return float(self.v[1])
     
     def __hash__(self) -> int:
         return hash((self.x, self.y))
@@ -136,28 +154,34 @@ class Vector:
     def __eq__(self, other) -> bool:
         if isinstance(other, Vector):
             return self.x == other.x and self.y == other.y
-        warnings.warn(f"Warning: Tried to compare  {type(self)} to {type(other)}")
         return NotImplemented
     
     def __add__(self, other: Vector) -> Vector:
-        if isinstance(other, Vector) or isinstance(other, Position):
-            return Position(self.x + (float)other.x, self.y + (float)other.y)
+        if isinstance(other, Vector):
+            return Vector.from_array(self.v + other.v)
+        if isinstance(other, Position):
+            return Vector(self.x + other.x, self.y + other.y)
         raise TypeError(f"Cannot add  {type(self)} to {type(other)}")
     
     def __sub__(self, other: Vector) -> Vector:
-        if isinstance(other, Vector) or isinstance(other, Position):
-            return Position(self.x - (float)other.x, self.y - (float)other.y)
+        if isinstance(other, Vector):
+            return Vector.from_array(self.v - other.v)
+        if isinstance(other, Position):
+            return Vector(self.x - other.x, self.y - other.y)
         raise TypeError(f"Cannot subtract {type(other)} from {type(self)}")
     
     def __mul__(self, other: float) -> Vector:
-        if isinstance(other, float) or isinstance(other, int):
-            return Vector(self.x * other, self.y * other)
+        if isinstance(other, SCALAR_TYPES):
+            return Vector.from_array(self.v * other)
         raise TypeError(f"Cannot multiply  {type(self)} with {type(other)}")
 
     def __truediv__(self, other: float) -> Vector:
-        if isinstance(other, int) or isinstance(other, float):
-            return Vector(self.x / other, self.y/other)
-        return TypeError(f"Cannot divide  {type(self)} by {type(other)}")
+        if isinstance(other, SCALAR_TYPES):
+            # NumPy would return inf with a warning instead of raising
+            if other == 0:
+                raise ZeroDivisionError(f"Cannot divide {type(self)} by zero")
+            return Vector.from_array(self.v / other)
+        raise TypeError(f"Cannot divide  {type(self)} by {type(other)}")
     
     def __rmul__(self, other: float) -> Vector:
         return self * other
@@ -166,16 +190,16 @@ class Vector:
         return f"({self.x}, {self.y})"
     
     def __repr__(self) -> str:
-        return f"Position({self.x}, {self.y})"
+        return f"Vector({self.x}, {self.y})"
     
     def sqr_magnitude(self) -> float:
-        return self.x*self.x + self.y*self.y
+        return float(self.v @ self.v)
     
-    @cached_property
     def magnitude(self) -> float:
+        # Prefer sqr_magnitude when only comparing lengths, it avoids the sqrt
         return self.sqr_magnitude()**0.5
     
-    def move_dir(self, direction: Direction, distance: int = 1) -> Position:
+    def move_dir(self, direction: Direction, distance: int = 1) -> Vector:
         """
         Returns a displaced position in a specific direction and by a specific amount
 
@@ -187,16 +211,16 @@ class Vector:
             DirectionError: Direction invalid
 
         Returns:
-            Position: Displaced position
+            Vector: Displaced vector
         """
         
         # In grids, the y axis is inverted. (0 is upmost, and we go down from there)
-        try:
-            return self + DIRECTION_VECTORS[direction] * distance
-        except KeyError:
+        if not isinstance(direction, int) or not 0 <= direction < 4:
             raise DirectionError(f"Cannot move position in direction \"{direction}\" because it's not a valid direction.")
+        v = DIRECTION_VECTORS[direction]
+        return Vector(self.x + v.x * distance, self.y + v.y * distance)
 
-    def move(self, x: int = 0, y: int = 0) -> Position:
+    def move(self, x: int = 0, y: int = 0) -> Vector:
         """Moves a vector by x and y coors.
         Helps to avoid instancing positions for single operations where it's not needed.
 
@@ -208,10 +232,10 @@ class Vector:
             TypeError: X or Y are not ints
 
         Returns:
-            Position: Displaced position
+            Vector: Displaced vector
         """
         if isinstance(x, int) and isinstance(y, int):
-            return Position(self.x + x, self.y + y)
+            return Vector(self.x + x, self.y + y)
         raise TypeError(f"Tried moving a position by {type(x)} and {type(y)} but a position can only be moved by ints.")
     
     def distance_to(self, other: Position) -> int: